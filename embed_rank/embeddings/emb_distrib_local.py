@@ -3,25 +3,155 @@
 #
 #Authors: Kamil Bennani-Smires, Yann Savary
 
+import os
+import time
+import warnings
+
+import numpy as np
 import sent2vec
 
 from .emb_distrib_interface import EmbeddingDistributor
 
 
+def _anonymous_rss():
+    '''Return the resident anonymous memory of the process in bytes, None if
+    it can not be read (no /proc).
+
+    File-backed pages are left out: they include the memory-mapped output of
+    @embed_vocabulary, which shrinking the chunks does not reduce. The peak RSS
+    given by `resource` is not used as a fallback either: it never decreases,
+    so after one spike the chunk size would stay at its minimum.
+    '''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) * 1024
+        # Kernels older than 4.5: resident minus shared pages
+        with open('/proc/self/statm') as statm:
+            fields = statm.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
 class EmbeddingDistributorLocal(EmbeddingDistributor):
     '''Concrete class of @EmbeddingDistributor using a local installation of
     sent2vec.
+
+    Sentences are embedded in chunks bounded by their total number of tokens.
+    The bound adapts to the observed latency of each chunk and shrinks while
+    the anonymous memory of the process is above `max_rss_bytes`.
     '''
 
-    def __init__(self, fasttext_model):
+    def __init__(self, fasttext_model, max_batch_tokens=100000, min_batch_tokens=1000, target_batch_seconds=1.0,
+                 max_rss_bytes=None, rss_headroom_bytes=2 * 1024 ** 3, max_tokens=100000, truncate=True):
+        '''
+        Args:
+            fasttext_model (str): path of the sent2vec model.
+            max_batch_tokens (int, optional): upper bound on the number of
+                tokens sent to sent2vec in one call.
+            min_batch_tokens (int, optional): lower bound for the adaptive
+                chunk size.
+            target_batch_seconds (float, optional): latency the chunk size is
+                adapted to.
+            max_rss_bytes (int, optional): halve the chunk size each time the
+                resident anonymous memory of the process is above this size
+                after a chunk. Defaults to its size once the model is loaded +
+                `rss_headroom_bytes`. Only supported where /proc is available.
+            rss_headroom_bytes (int, optional): see `max_rss_bytes`.
+            max_tokens (int, optional): maximum number of tokens of a single
+                sentence, no limit if None.
+            truncate (bool, optional): if True, sentences longer than
+                `max_tokens` are truncated, otherwise a ValueError is raised.
+        '''
         self.model = sent2vec.Sent2vecModel()
         self.model.load_model(fasttext_model)
 
+        self.max_batch_tokens = max_batch_tokens
+        self.min_batch_tokens = min(min_batch_tokens, max_batch_tokens)
+        self.target_batch_seconds = target_batch_seconds
+        self.max_tokens = max_tokens
+        self.truncate = truncate
+        self.batch_tokens = max_batch_tokens
+
+        rss = _anonymous_rss()
+        if rss is None:
+            warnings.warn('Cannot read the memory of the process, the chunk size only adapts to latency')
+            self.max_rss_bytes = None
+        elif max_rss_bytes is None:
+            self.max_rss_bytes = rss + rss_headroom_bytes
+        else:
+            self.max_rss_bytes = max_rss_bytes
+
     def get_tokenized_sents_embeddings(self, sents):
         '''@see EmbeddingDistributor
         '''
-        for sent in sents:
+        sents = list(sents)
+        embeddings = np.empty((len(sents), self.model.get_emb_size()), dtype=np.float32)
+
+        token_counts = np.empty(len(sents), dtype=np.int64)
+        for i, sent in enumerate(sents):
             if '\n' in sent:
                 raise RuntimeError('New line is not allowed inside a sentence')
+            token_counts[i] = sent.count(' ') + 1
+
+        if self.max_tokens is not None:
+            self._limit_size(sents, token_counts)
 
-        return self.model.embed_sentences(sents)
+        cumulative_tokens = np.cumsum(token_counts)
+        start = 0
+        while start < len(sents):
+            offset = cumulative_tokens[start - 1] if start > 0 else 0
+            end = int(np.searchsorted(cumulative_tokens, offset + self.batch_tokens, side='right'))
+            end = max(end, start + 1)  # A sentence longer than the chunk size is embedded alone
+
+            begin = time.perf_counter()
+            embeddings[start:end] = self.model.embed_sentences(sents[start:end])
+            self._adapt_batch_tokens(cumulative_tokens[end - 1] - offset, time.perf_counter() - begin)
+            start = end
+
+        return embeddings
+
+    def _limit_size(self, sents, token_counts):
+        '''Truncate (in place) or reject the sentences longer than `max_tokens`.'''
+        oversized = np.flatnonzero(token_counts > self.max_tokens)
+        if len(oversized) == 0:
+            return
+
+        if not self.truncate:
+            raise ValueError(f'{len(oversized)} sentences are longer than {self.max_tokens} tokens')
+
+        warnings.warn(f'Truncating {len(oversized)} sentences to {self.max_tokens} tokens')
+        for i in oversized:
+            sents[i] = ' '.join(sents[i].split(' ', self.max_tokens)[:self.max_tokens])
+            token_counts[i] = self.max_tokens
+
+    def _adapt_batch_tokens(self, tokens, seconds):
+        '''Update the chunk size from the latency of the last chunk and the
+        memory of the process.'''
+        if self.max_rss_bytes is not None and _anonymous_rss() > self.max_rss_bytes:
+            self.batch_tokens //= 2
+        elif seconds > 0:
+            self.batch_tokens = int(tokens * self.target_batch_seconds / seconds)
+        self.batch_tokens = min(max(self.batch_tokens, self.min_batch_tokens), self.max_batch_tokens)
+
+
+def embedding_distributor_from_config(config):
+    '''Build an @EmbeddingDistributorLocal from the [SENT2VEC] section of a
+    config, see config.ini.template.
+
+    Args:
+        config (ConfigParser)
+
+    Returns:
+        EmbeddingDistributorLocal
+    '''
+    sent2vec_model = config.get('SENT2VEC', 'model_path')
+    print(f'Loading sent2vec model from {sent2vec_model}')
+    return EmbeddingDistributorLocal(
+        sent2vec_model,
+        max_batch_tokens=config.getint('SENT2VEC', 'max_batch_tokens', fallback=100000),
+        max_rss_bytes=config.getint('SENT2VEC', 'max_rss_bytes', fallback=None),
+        max_tokens=config.getint('SENT2VEC', 'max_tokens', fallback=100000),
+        truncate=config.getboolean('SENT2VEC', 'truncate', fallback=True))
@@ -0,0 +1,184 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+'''Corpus statistics on candidate phrases, used to drop generic or rare
+candidates before they are embedded.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+
+from ..preprocessing.tagged_corpus import iter_tagged_corpus
+from ..util.fileIO import read_file
+from .extractor import extract_candidates
+
+KEYS = 'keys.npy'
+DF = 'df.npy'
+META = 'meta.json'
+
+
+def phrase_keys(phrases):
+    '''Hash phrases to 64 bits keys, stable across processes.
+
+    Args:
+        phrases (list): list of string
+
+    Returns:
+        numpy array of uint64
+    '''
+    return np.array([int.from_bytes(hashlib.blake2b(phrase.encode('utf-8'), digest_size=8).digest(), 'little')
+                     for phrase in phrases], dtype=np.uint64)
+
+
+class CandidateFrequencyIndex:
+    '''Document frequency of candidate phrases over a corpus.
+
+    Stored as a directory holding the sorted phrase keys and their document
+    frequencies as .npy files, which are memory-mapped when loaded.
+    '''
+
+    def __init__(self, keys, df, num_docs, path=None):
+        '''
+        Args:
+            keys (ndarray): sorted uint64 keys, see @phrase_keys
+            df (ndarray): number of documents containing each key
+            num_docs (int): number of documents of the corpus
+            path (str, optional): directory the index was loaded from
+        '''
+        self.keys = keys
+        self.df = df
+        self.num_docs = num_docs
+        self.path = path
+
+    @classmethod
+    def build(cls, text_objs, no_subset=False):
+        '''Count in how many documents each candidate phrase appears.
+
+        Args:
+            text_objs: iterable of (document id, @InputTextObj), see
+                @iter_tagged_corpus
+            no_subset (bool, optional): see @extract_candidates
+
+        Returns:
+            CandidateFrequencyIndex
+        '''
+        doc_keys = []
+        for _, text_obj in text_objs:
+            doc_keys.append(phrase_keys(extract_candidates(text_obj, no_subset)))
+
+        all_keys = np.concatenate(doc_keys) if doc_keys else np.array([], dtype=np.uint64)
+        keys, inverse = np.unique(all_keys, return_inverse=True)
+        df = np.bincount(inverse, minlength=len(keys)).astype(np.uint32)
+        return cls(keys, df, len(doc_keys))
+
+    def save(self, path):
+        '''Write the index to a directory.
+
+        Args:
+            path (str): directory to create
+        '''
+        os.makedirs(path)
+        np.save(os.path.join(path, KEYS), self.keys)
+        np.save(os.path.join(path, DF), self.df)
+        with open(os.path.join(path, META), 'w') as meta_file:
+            json.dump({'num_docs': self.num_docs}, meta_file)
+        self.path = path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        '''Load an index written by @save.
+
+        Args:
+            path (str): directory of the index
+            mmap_mode (str, optional): passed to `np.load`
+
+        Returns:
+            CandidateFrequencyIndex
+        '''
+        with open(os.path.join(path, META)) as meta_file:
+            meta = json.load(meta_file)
+        return cls(np.load(os.path.join(path, KEYS), mmap_mode=mmap_mode),
+                   np.load(os.path.join(path, DF), mmap_mode=mmap_mode),
+                   meta['num_docs'],
+                   path)
+
+    def document_frequency(self, phrases):
+        '''Return the document frequency of each phrase, 0 for unknown phrases.
+
+        Args:
+            phrases (list): list of string
+
+        Returns:
+            numpy array of int
+        '''
+        keys = phrase_keys(phrases)
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[pos] == keys
+        return np.where(found, self.df[pos], 0).astype(np.int64)
+
+
+class DocumentFrequencyFilter:
+    '''Candidate filter dropping the phrases which appear in too many
+    documents of the corpus (e.g. "results", "paper") or in too few.
+    '''
+
+    def __init__(self, index, max_df=1.0, min_df=0):
+        '''
+        Args:
+            index (CandidateFrequencyIndex)
+            max_df (float, optional): drop candidates appearing in more than
+                this proportion of the documents.
+            min_df (int, optional): drop candidates appearing in less than this
+                number of documents. Note that candidates unknown to the index
+                have a document frequency of 0.
+        '''
+        if max_df * index.num_docs < 1:
+            warnings.warn(f'max_df={max_df} is below one document of the index ({index.num_docs} documents): '
+                          'every candidate known to the index will be dropped')
+
+        self.index = index
+        self.max_df = max_df
+        self.min_df = min_df
+
+    def __call__(self, candidates):
+        '''
+        Args:
+            candidates (list): list of candidate phrases (string)
+
+        Returns:
+            numpy boolean array, True for the candidates to keep
+        '''
+        df = self.index.document_frequency(candidates)
+        return (df <= self.max_df * self.index.num_docs) & (df >= self.min_df)
+
+
+def main():
+    '''Parse args and build a candidate frequency index.
+    '''
+    parser = argparse.ArgumentParser(description='Compute the document frequency of candidate phrases over a '
+                                     'corpus of POS tagged files')
+    parser.add_argument('-l', '--listing-file', required=True,
+                        help='Path to a text file containing in each row a path to a file to process')
+    parser.add_argument('-o', '--output', required=True,
+                        help='Directory where to write the index')
+    parser.add_argument('-s', '--suffix', default='_POS',
+                        help='Suffix of the POS tagged files')
+    args = parser.parse_args()
+
+    list_of_path = read_file(args.listing_file).splitlines()
+    index = CandidateFrequencyIndex.build(iter_tagged_corpus(list_of_path, args.suffix))
+    index.save(args.output)
+    print(f'{len(index.keys)} candidates from {index.num_docs} documents written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+'''Two-pass keyphrase extraction over a whole corpus.
+
+Pass 1 extracts the candidates of every document and maps them to ids in a
+deduplicated, corpus-wide vocabulary. Each unique phrase is then embedded
+exactly once, in large batches, into a memory-mapped matrix. Pass 2 selects
+the keyphrases of each document (MMR by default) by gathering the rows of its
+candidates from that matrix.
+'''
+
+import argparse
+import warnings
+from collections import OrderedDict
+from configparser import ConfigParser
+
+import numpy as np
+
+from ..preprocessing.tagged_corpus import iter_tagged_corpus
+from ..util.fileIO import read_file
+from ..util.result_writer import ResultWriter
+from .candidate_index import CandidateFrequencyIndex, DocumentFrequencyFilter
+from .extractor import extract_candidates
+from .method import STRATEGIES, MMRStrategy, _select, get_strategy
+
+
+def build_candidate_vocabulary(text_objs, no_subset=False, candidate_filter=None):
+    '''Pass 1: extract the candidates of each document and index them in a
+    corpus-wide vocabulary.
+
+    Args:
+        text_objs: iterable of (document id, @InputTextObj)
+        no_subset (bool, optional): see @extract_candidates
+        candidate_filter (callable, optional): see
+            @extract_candidates_embedding_for_doc
+
+    Returns:
+        A tuple of two elements containing
+            1) the list of unique candidate phrases, the position of a phrase
+                being its id
+            2) an OrderedDict mapping each document id to a numpy array with
+                the ids of its candidates
+    '''
+    vocabulary = {}
+    doc_candidate_ids = OrderedDict()
+
+    for doc_id, text_obj in text_objs:
+        candidates = extract_candidates(text_obj, no_subset)
+        if candidate_filter is not None and len(candidates) > 0:
+            candidates = np.array(candidates)[candidate_filter(candidates)].tolist()
+        doc_candidate_ids[doc_id] = np.array([vocabulary.setdefault(c, len(vocabulary)) for c in candidates],
+                                             dtype=np.int64)
+
+    phrases = [None] * len(vocabulary)
+    for phrase, idx in vocabulary.items():
+        phrases[idx] = phrase
+
+    return phrases, doc_candidate_ids
+
+
+def embed_vocabulary(embedding_distrib, phrases, output_path, batch_size=10000):
+    '''Embed each phrase of the vocabulary once and store the result in a
+    memory-mapped .npy file.
+
+    Args:
+        embedding_distrib: embedding distributor see @EmbeddingDistributor
+        phrases (list): unique candidate phrases (string)
+        output_path (str): path of the .npy file to write
+        batch_size (int, optional): number of phrases sent at once to the
+            embedding distributor
+
+    Returns:
+        numpy memmap of shape (len(phrases), dimension of embeddings), or None
+        if there is no phrase to embed.
+    '''
+    embeddings = None
+
+    for start in range(0, len(phrases), batch_size):
+        batch = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(phrases[start:start + batch_size]))
+        if embeddings is None:
+            # The dimension is only known once the first batch is embedded
+            embeddings = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32,
+                                                   shape=(len(phrases), batch.shape[1]))
+        embeddings[start:start + len(batch)] = batch
+
+    if embeddings is not None:
+        embeddings.flush()
+
+    return embeddings
+
+
+def extract_keyphrases_for_corpus(embedding_distrib, text_objs, phrases, doc_candidate_ids, embeddings,
+                                  beta=0.55, N=10, use_filtered=True, alias_threshold=0.7, strategy=None):
+    '''Pass 2: select the keyphrases of each document using the precomputed
+    candidate embeddings.
+
+    Args:
+        embedding_distrib: embedding distributor see @EmbeddingDistributor,
+            only used for the document embeddings
+        text_objs: iterable of (document id, @InputTextObj)
+        phrases (list): vocabulary returned by @build_candidate_vocabulary
+        doc_candidate_ids (dict): document id -> candidate ids, returned by
+            @build_candidate_vocabulary
+        embeddings (ndarray): matrix returned by @embed_vocabulary
+        beta (float, optional): hyperparameter beta for MMR
+        N (int, optional): number of keyphrases to extract per document
+        use_filtered (bool, optional): if true filter the text by keeping only
+            candidate word before computing the doc embedding
+        alias_threshold (float, optional): threshold to group candidates as aliases
+        strategy (SelectionStrategy, optional): MMRStrategy(beta) if None
+
+    Yields:
+        tuple: (document id, result of @_select, embeddings of the selected
+            keyphrases as an array of shape (number of keyphrases, dimension of
+            embeddings), None if `embeddings` is None)
+    '''
+    if strategy is None:
+        strategy = MMRStrategy(beta)
+
+    for doc_id, text_obj in text_objs:
+        ids = doc_candidate_ids.get(doc_id)
+        if ids is None:
+            warnings.warn(f'Document {doc_id} was not seen during the first pass')
+            continue
+
+        if len(ids) > 0:
+            X = np.asarray(embeddings[ids])
+            valid_candidates_mask = ~np.all(X == 0, axis=1)  # Only candidates which are not unknown.
+            candidates = np.array([phrases[i] for i in ids[valid_candidates_mask]])
+            X = X[valid_candidates_mask, :]
+        else:
+            candidates = np.array([])
+
+        if len(candidates) == 0:
+            warnings.warn(f'No keyphrase extracted for document {doc_id}')
+            yield doc_id, (None, None, None), None if embeddings is None else embeddings[:0]
+            continue
+
+        result = _select(embedding_distrib, text_obj, candidates, X, N, use_filtered, alias_threshold, strategy)
+        candidate_rows = {candidate: i for i, candidate in enumerate(candidates)}
+        yield doc_id, result, X[[candidate_rows[kp] for kp in result[0]]]
+
+
+def main():
+    '''Parse args and extract keyphrases from a list of files.
+    '''
+    parser = argparse.ArgumentParser(description='Extract keyphrases from a corpus in two passes, embedding '
+                                     'each unique candidate phrase only once')
+    parser.add_argument('-l', '--listing-file', required=True,
+                        help='Path to a text file containing in each row a path to a file to process')
+    parser.add_argument('-e', '--embeddings-path', required=True,
+                        help='Path of the .npy file holding the candidate embeddings')
+    parser.add_argument('-s', '--suffix', default='_POS',
+                        help='Suffix of the POS tagged files')
+    parser.add_argument('--tag', action='store_true',
+                        help='POS tag the files before extracting keyphrases')
+    parser.add_argument('--batch-size', default=10000, type=int,
+                        help='Number of phrases to embed at once')
+    parser.add_argument('--df-index',
+                        help='Candidate frequency index used to filter candidates before embedding them')
+    parser.add_argument('--max-df',
+                        help='Drop candidates appearing in more than this proportion of the documents of the index',
+                        default=1.0,
+                        type=float)
+    parser.add_argument('--min-df',
+                        help='Drop candidates appearing in less than this number of documents of the index',
+                        default=0,
+                        type=int)
+    parser.add_argument('-o', '--output',
+                        help='Directory where to write the results with ResultWriter, print them if not set')
+    parser.add_argument('--row-group-size', default=10000, type=int,
+                        help='Number of documents per row group of the output')
+    parser.add_argument('--with-embeddings', action='store_true',
+                        help='Also write the embeddings of the keyphrases to the output')
+    parser.add_argument('-a', '--alias-threshold',
+                        help='Threshold to group candidates as aliases',
+                        default=0.7,
+                        type=float)
+    parser.add_argument('-b', '--beta',
+                        help='Beta factor for MMR (tradeoff informativness/diversity)',
+                        default=0.55,
+                        type=float)
+    parser.add_argument('-c', '--count',
+                        help='Number of keyphrases to extract',
+                        default=10,
+                        type=int)
+    parser.add_argument('-d', '--dedup-threshold',
+                        help='Similarity above which candidates are skipped by the dedup strategy',
+                        default=0.8,
+                        type=float)
+    parser.add_argument('--strategy',
+                        default='mmr',
+                        choices=STRATEGIES,
+                        help='Keyphrase selection strategy')
+    args = parser.parse_args()
+
+    # Imported here so that the passes above can be used without sent2vec/spaCy
+    from ..embeddings.emb_distrib_local import embedding_distributor_from_config
+    from ..preprocessing.postagging import PosTagging
+
+    config = ConfigParser()
+    config.read('config.ini')
+
+    list_of_path = read_file(args.listing_file).splitlines()
+
+    if args.tag:
+        pos_tagger = PosTagging(model=config.get('SPACY', 'model'))
+        print('POS Tagging and writing ', len(list_of_path), 'files')
+        pos_tagger.pos_tag_and_write_corpora(list_of_path, args.suffix)
+
+    candidate_filter = None
+    if args.df_index:
+        candidate_filter = DocumentFrequencyFilter(CandidateFrequencyIndex.load(args.df_index),
+                                                   max_df=args.max_df,
+                                                   min_df=args.min_df)
+
+    phrases, doc_candidate_ids = build_candidate_vocabulary(iter_tagged_corpus(list_of_path, args.suffix),
+                                                            candidate_filter=candidate_filter)
+    print(f'{len(phrases)} unique candidates in {len(doc_candidate_ids)} documents')
+
+    embedding_distributor = embedding_distributor_from_config(config)
+
+    embeddings = embed_vocabulary(embedding_distributor, phrases, args.embeddings_path, args.batch_size)
+
+    results = extract_keyphrases_for_corpus(embedding_distributor,
+                                            iter_tagged_corpus(list_of_path, args.suffix),
+                                            phrases,
+                                            doc_candidate_ids,
+                                            embeddings,
+                                            beta=args.beta,
+                                            N=args.count,
+                                            alias_threshold=args.alias_threshold,
+                                            strategy=get_strategy(args.strategy, args.beta, args.dedup_threshold))
+    if args.output:
+        with ResultWriter(args.output, args.row_group_size) as writer:
+            for doc_id, (keyphrases, relevance, aliases), kp_embeddings in results:
+                writer.write(doc_id, keyphrases, relevance, aliases,
+                             kp_embeddings if args.with_embeddings else None)
+        print(f'Results written to {args.output}')
+    else:
+        for doc_id, keyphrases, _ in results:
+            print(doc_id, keyphrases)
+
+
+if __name__ == '__main__':
+    main()
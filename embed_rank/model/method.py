@@ -4,6 +4,7 @@
 #Authors: Kamil Bennani-Smires, Yann Savary
 
 import warnings
+from abc import ABC, abstractmethod
 
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
@@ -13,19 +14,189 @@ from .methods_embeddings import (extract_candidates_embedding_for_doc,
                                  extract_sent_candidates_embedding_for_doc)
 
 
-def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold):
-    '''Core method using Maximal Marginal Relevance in charge to return the
-    top-N candidates.
+class SelectionStrategy(ABC):
+    '''Abstract class in charge of selecting the keyphrases among the candidates.
+    '''
+    @abstractmethod
+    def select(self, doc_sim, X, N):
+        '''Select N candidates.
+
+        Args:
+            doc_sim (ndarray): array of shape (number of candidates, 1) with the
+                cosine similarity between each candidate and the document
+            X (ndarray): numpy array with the embedding of each candidate in each row
+            N (int): number of candidates to select (at most the number of candidates)
+
+        Returns:
+            list: indices of the selected candidates, most relevant first
+        '''
+        pass
+
+    def matrix_bytes(self, K, N, D):
+        '''Return the size of the intermediate matrices allocated by @select.
+
+        Args:
+            K (int): number of candidates
+            N (int): number of candidates to select
+            D (int): dimension of the embeddings
+        '''
+        return 0
+
+
+class MMRStrategy(SelectionStrategy):
+    '''Maximal Marginal Relevance, trading off informativeness and diversity.
+
+    Needs the full pairwise similarity matrix: O(K^2) time and memory for K
+    candidates.
+    '''
+
+    def __init__(self, beta=0.55):
+        '''
+        Args:
+            beta (float, optional): hyperparameter beta for MMR (control tradeoff
+                between informativeness and diversity)
+        '''
+        self.beta = beta
+
+    def matrix_bytes(self, K, N, D):
+        '''@see SelectionStrategy
+        '''
+        return 2 * K * K * 8  # sim_between and sim_between_norm
+
+    def select(self, doc_sim, X, N):
+        '''@see SelectionStrategy
+        '''
+        beta = self.beta
+
+        doc_sim_norm = doc_sim/np.max(doc_sim)
+        doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
+
+        sim_between = cosine_similarity(X)
+        np.fill_diagonal(sim_between, np.NaN)
+
+        sim_between_norm = sim_between/np.nanmax(sim_between, axis=0)
+        sim_between_norm = \
+            0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
+
+        selected_candidates = []
+        unselected_candidates = [c for c in range(len(X))]
+
+        j = np.argmax(doc_sim)
+        selected_candidates.append(j)
+        unselected_candidates.remove(j)
+
+        for _ in range(N - 1):
+            selec_array = np.array(selected_candidates)
+            unselec_array = np.array(unselected_candidates)
+
+            distance_to_doc = doc_sim_norm[unselec_array, :]
+            dist_between = sim_between_norm[unselec_array][:, selec_array]
+            if dist_between.ndim == 1:
+                dist_between = dist_between[:, np.newaxis]
+            j = np.argmax(beta * distance_to_doc - (1 - beta) * np.max(dist_between, axis=1).reshape(-1, 1))
+            item_idx = unselected_candidates[j]
+            selected_candidates.append(item_idx)
+            unselected_candidates.remove(item_idx)
+
+        return selected_candidates
+
+
+class RelevanceStrategy(SelectionStrategy):
+    '''Plain EmbedRank: the N candidates most similar to the document.
+
+    O(K) time and memory, no pairwise similarity is computed.
+    '''
+
+    def select(self, doc_sim, X, N):
+        '''@see SelectionStrategy
+        '''
+        doc_sim = doc_sim.ravel()
+        top = np.argpartition(-doc_sim, N - 1)[:N]
+        return top[np.argsort(-doc_sim[top])].tolist()
+
+
+class GreedyDedupStrategy(SelectionStrategy):
+    '''Take candidates by decreasing relevance, skipping those too similar to
+    an already selected candidate.
+
+    Each candidate is only compared to the selected ones: O(K.N) time and
+    O(N) extra memory. Fewer than N candidates are returned if not enough of
+    them are dissimilar enough.
+    '''
+
+    def __init__(self, threshold=0.8):
+        '''
+        Args:
+            threshold (float, optional): candidates with a cosine similarity
+                above this value with a selected candidate are skipped
+        '''
+        self.threshold = threshold
+
+    def matrix_bytes(self, K, N, D):
+        '''@see SelectionStrategy
+        '''
+        return N * D * 8  # selected_embeddings
+
+    def select(self, doc_sim, X, N):
+        '''@see SelectionStrategy
+        '''
+        norms = np.linalg.norm(X, axis=1)
+        norms[norms == 0] = 1
+        selected_candidates = []
+        selected_embeddings = np.empty((N, X.shape[1]), dtype=np.float64)
+
+        for idx in np.argsort(-doc_sim.ravel()):
+            embedding = X[idx] / norms[idx]
+            if selected_candidates and \
+                    np.max(selected_embeddings[:len(selected_candidates)].dot(embedding)) > self.threshold:
+                continue
+            selected_embeddings[len(selected_candidates)] = embedding
+            selected_candidates.append(int(idx))
+            if len(selected_candidates) == N:
+                break
+
+        return selected_candidates
+
+
+STRATEGIES = ('mmr', 'relevance', 'dedup')
+
+
+def get_strategy(name, beta=0.55, dedup_threshold=0.8):
+    '''Build a selection strategy from its name.
+
+    Args:
+        name (str): one of @STRATEGIES
+        beta (float, optional): see @MMRStrategy
+        dedup_threshold (float, optional): see @GreedyDedupStrategy
+
+    Returns:
+        SelectionStrategy
+    '''
+    if name == 'mmr':
+        return MMRStrategy(beta)
+    elif name == 'relevance':
+        return RelevanceStrategy()
+    elif name == 'dedup':
+        return GreedyDedupStrategy(dedup_threshold)
+    else:
+        raise ValueError(f'Unknown selection strategy `{name}`')
+
+
+def _select(embdistrib, text_obj, candidates, X, N, use_filtered, alias_threshold, strategy, stages=None):
+    '''Core method in charge to return the top-N candidates selected by a
+    strategy.
 
     Args:
         embdistrib: embdistrib: embedding distributor see @EmbeddingDistributor
         text_obj (): Input text representation see @InputTextObj
         candidates (list): list of candidates (string)
         X (ndarray): numpy array with the embedding of each candidate in each row
-        beta (float): hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
         N (int): number of candidates to extract
         use_filtered (bool): if true filter the text by keeping only candidate word before computing the doc embedding
         alias_threshold
+        strategy (SelectionStrategy)
+        stages (dict, optional): if set, the number of candidates and
+            keyphrases and the size of the similarity matrices are recorded in it
 
     Returns:
         A tuple with 3 elements :
@@ -35,47 +206,42 @@ def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_thres
     '''
 
     N = min(N, len(candidates))
+    if stages is not None:
+        K, D = X.shape
+        stages.update({'candidates': K,
+                       'keyphrases': max(N, 0),
+                       # The strategy's matrices plus the N x K similarities used for the aliases
+                       'matrix_bytes': strategy.matrix_bytes(K, max(N, 0), D) + max(N, 0) * K * 8})
+    if N <= 0:
+        return [], [], []
+
     doc_embedd = extract_doc_embedding(embdistrib, text_obj, use_filtered)  # Extract doc embedding
     doc_sim = cosine_similarity(X, doc_embedd.reshape(1, -1))
 
-    doc_sim_norm = doc_sim/np.max(doc_sim)
-    doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
-
-    sim_between = cosine_similarity(X)
-    np.fill_diagonal(sim_between, np.NaN)
+    selected_candidates = strategy.select(doc_sim, X, N)
 
-    sim_between_norm = sim_between/np.nanmax(sim_between, axis=0)
-    sim_between_norm = \
-        0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
-
-    selected_candidates = []
-    unselected_candidates = [c for c in range(len(candidates))]
+    # Not using normalized version of doc_sim for computing relevance
+    relevance_list = max_normalization(doc_sim[selected_candidates]).tolist()
 
-    j = np.argmax(doc_sim)
-    selected_candidates.append(j)
-    unselected_candidates.remove(j)
+    # Only the rows of the selected candidates are needed for the aliases
+    kp_sim_between = cosine_similarity(X[selected_candidates], X)
+    kp_sim_between[np.arange(len(selected_candidates)), selected_candidates] = np.NaN
+    aliases_list = get_aliases(kp_sim_between, candidates, alias_threshold)
 
-    for _ in range(N - 1):
-        selec_array = np.array(selected_candidates)
-        unselec_array = np.array(unselected_candidates)
+    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
 
-        distance_to_doc = doc_sim_norm[unselec_array, :]
-        dist_between = sim_between_norm[unselec_array][:, selec_array]
-        if dist_between.ndim == 1:
-            dist_between = dist_between[:, np.newaxis]
-        j = np.argmax(beta * distance_to_doc - (1 - beta) * np.max(dist_between, axis=1).reshape(-1, 1))
-        item_idx = unselected_candidates[j]
-        selected_candidates.append(item_idx)
-        unselected_candidates.remove(item_idx)
 
-    # Not using normalized version of doc_sim for computing relevance
-    relevance_list = max_normalization(doc_sim[selected_candidates]).tolist()
-    aliases_list = get_aliases(sim_between[selected_candidates, :], candidates, alias_threshold)
+def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold):
+    '''Core method using Maximal Marginal Relevance in charge to return the
+    top-N candidates.
 
-    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
+    @see _select, @MMRStrategy
+    '''
+    return _select(embdistrib, text_obj, candidates, X, N, use_filtered, alias_threshold, MMRStrategy(beta))
 
 
-def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8):
+def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8, strategy=None,
+              candidate_filter=None, stages=None):
     '''Extract N keyphrases.
 
     :param embdistrib: embedding distributor see @EmbeddingDistributor
@@ -83,21 +249,31 @@ def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_th
     :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
     :param N: number of keyphrases to extract
     :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param alias_threshold: threshold to group candidates as aliases
+    :param strategy: SelectionStrategy used to select the keyphrases, MMRStrategy(beta) if None
+    :param candidate_filter: see @extract_candidates_embedding_for_doc
+    :param stages: see @_select
     :return: A tuple with 3 elements :
     1)list of the top-N candidates (or less if there are not enough candidates) (list of string)
     2)list of associated relevance scores (list of float)
     3)list containing for each keyphrase a list of alias (list of list of string)
     '''
-    candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj)
+    candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj, candidate_filter)
 
     if len(candidates) == 0:
         warnings.warn('No keyphrase extracted for this document')
+        if stages is not None:
+            stages.update({'candidates': 0, 'keyphrases': 0, 'matrix_bytes': 0})
         return None, None, None
 
-    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold)
+    if strategy is None:
+        strategy = MMRStrategy(beta)
+
+    return _select(embdistrib, text_obj, candidates, X, N, use_filtered, alias_threshold, strategy, stages)
 
 
-def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True):
+def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True, alias_threshold=0.8, strategy=None,
+            stages=None):
     '''
 
     Args:
@@ -106,6 +282,9 @@ def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True):
         beta (float): beta hyperparameter for MMR
         N (int): number of key sentences to extract
         use_filtered (bool, optional): if true filter the text by keeping only candidate word before computing the doc embedding
+        alias_threshold (float, optional): threshold to group candidates as aliases
+        strategy (SelectionStrategy, optional): MMRStrategy(beta) if None
+        stages (dict, optional): see @_select
 
     Returns:
         list of N key sentences (or less if there are not enough candidates)
@@ -114,9 +293,14 @@ def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True):
 
     if len(candidates) == 0:
         warnings.warn('No keysentence extracted for this document')
+        if stages is not None:
+            stages.update({'candidates': 0, 'keyphrases': 0, 'matrix_bytes': 0})
         return []
 
-    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered)
+    if strategy is None:
+        strategy = MMRStrategy(beta)
+
+    return _select(embdistrib, text_obj, candidates, X, N, use_filtered, alias_threshold, strategy, stages)
 
 
 def max_normalization(array):
@@ -28,7 +28,7 @@ def extract_doc_embedding(embedding_distrib, inp_rpr, use_filtered=False):
     return embedding_distrib.get_tokenized_sents_embeddings([tokenized_doc_text])
 
 
-def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
+def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr, candidate_filter=None):
     '''Return the list of candidate phrases as well as the associated numpy
     array that contains their embeddings.
 
@@ -38,6 +38,9 @@ def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
     Args:
         embedding_distrib: embedding distributor see @EmbeddingDistributor
         inp_rpr: input text representation see @InputTextObj
+        candidate_filter (callable, optional): called with the candidates
+            before they are embedded, returns a boolean mask of the ones to keep
+            see @DocumentFrequencyFilter
 
     Returns:
         A tuple of two element containing
@@ -46,6 +49,8 @@ def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
                 of embeddings: each row is the embedding of one candidate phrase
     '''
     candidates = np.array(extract_candidates(inp_rpr))  # List of candidates based on PosTag rules
+    if candidate_filter is not None and len(candidates) > 0:
+        candidates = candidates[candidate_filter(candidates)]
     if len(candidates) > 0:
         embeddings = np.array(embedding_distrib.get_tokenized_sents_embeddings(candidates))  # Associated embeddings
         valid_candidates_mask = ~np.all(embeddings == 0, axis=1)  # Only candidates which are not unknown.
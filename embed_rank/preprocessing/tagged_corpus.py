@@ -0,0 +1,42 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+'''Read a corpus of files POS tagged by @PosTagging.pos_tag_and_write_corpora.
+'''
+
+import os
+import warnings
+
+from ..model.input_representation import InputTextObj
+from ..util.fileIO import read_file
+from ..util.solr_fields import process_tagged_text
+
+
+def iter_tagged_corpus(list_of_path, suffix='_POS'):
+    '''Read the POS tagged version of a list of files.
+
+    The tagged files are expected to be the ones written by
+    @PosTagging.pos_tag_and_write_corpora, i.e. next to the original file
+    with the same name + suffix.
+
+    Args:
+        list_of_path (list): list containing the path (as string) of each
+            original file.
+        suffix (str, optional): suffix of the POS tagged files.
+
+    Yields:
+        tuple: (path of the original file, @InputTextObj)
+    '''
+    for path in list_of_path:
+        tagged_path = path + suffix
+        if not os.path.isfile(tagged_path):
+            warnings.warn(f'File {tagged_path} does not exist')
+            continue
+
+        tagged_text = read_file(tagged_path)
+        if not tagged_text:
+            warnings.warn(f'File {tagged_path} is empty')
+            continue
+
+        yield path, InputTextObj(process_tagged_text(tagged_text))
@@ -0,0 +1,198 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+'''Capture of pathologically slow extractions so that they can be replayed
+offline.
+
+A case is a directory holding:
+
+    input.txt             the raw text of the request
+    case.json             parameters, reason, latency, stage sizes and error if any
+    profile.pstats        (profiled runs only) cProfile statistics
+    tracemalloc.snapshot  (profiled runs only) see `tracemalloc.Snapshot.load`
+    tracemalloc.txt       (profiled runs only) top allocations by line
+'''
+
+import cProfile
+import json
+import os
+import random
+import time
+import tracemalloc
+import uuid
+
+INPUT = 'input.txt'
+CASE = 'case.json'
+PROFILE = 'profile.pstats'
+SNAPSHOT = 'tracemalloc.snapshot'
+SNAPSHOT_TOP = 'tracemalloc.txt'
+
+
+def profile_call(func, frames=10):
+    '''Run `func` under cProfile and tracemalloc.
+
+    An exception raised by `func` is returned instead of propagated so that
+    the caller can save what was measured before re-raising it.
+
+    Args:
+        func (callable): called with a dict in which it can record the size of
+            its stages.
+        frames (int, optional): number of frames stored by tracemalloc.
+
+    Returns:
+        A tuple with 6 elements: the result of `func` (None on error), the
+        exception it raised (None on success), its latency in seconds, the
+        stage sizes recorded so far, the `cProfile.Profile` and the
+        `tracemalloc.Snapshot`.
+    '''
+    stages = {}
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        # Also resets the peak, which would otherwise date from the start of tracing
+        tracemalloc.clear_traces()
+    else:
+        tracemalloc.start(frames)
+
+    result, error = None, None
+    profile = cProfile.Profile()
+    begin = time.perf_counter()
+    try:
+        result = profile.runcall(func, stages)
+    except Exception as e:
+        error = e
+    finally:
+        latency = time.perf_counter() - begin
+        snapshot = tracemalloc.take_snapshot()
+        stages['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return result, error, latency, stages, profile, snapshot
+
+
+def _describe(error):
+    '''Return a JSON serializable description of an exception, None if None.'''
+    return None if error is None else repr(error)
+
+
+def save_case(directory, raw_text, params, info, profile=None, snapshot=None):
+    '''Write a case to a new directory.
+
+    Args:
+        directory (str): directory to create.
+        raw_text (str): input of the request.
+        params (dict): JSON serializable parameters of the request.
+        info (dict): JSON serializable details (reason, latency, stage sizes,
+            error).
+        profile (cProfile.Profile, optional)
+        snapshot (tracemalloc.Snapshot, optional)
+    '''
+    os.makedirs(directory)
+
+    with open(os.path.join(directory, INPUT), 'w') as input_file:
+        input_file.write(raw_text)
+    with open(os.path.join(directory, CASE), 'w') as case_file:
+        json.dump({'params': params, **info}, case_file, indent=2)
+
+    if profile is not None:
+        profile.dump_stats(os.path.join(directory, PROFILE))
+    if snapshot is not None:
+        snapshot.dump(os.path.join(directory, SNAPSHOT))
+        with open(os.path.join(directory, SNAPSHOT_TOP), 'w') as top_file:
+            for stat in snapshot.statistics('lineno')[:50]:
+                top_file.write(f'{stat}\n')
+
+
+def load_case(directory):
+    '''Read a case written by @save_case.
+
+    Args:
+        directory (str)
+
+    Returns:
+        A tuple with the raw text and the content of case.json (dict).
+    '''
+    with open(os.path.join(directory, INPUT)) as input_file:
+        raw_text = input_file.read()
+    with open(os.path.join(directory, CASE)) as case_file:
+        return raw_text, json.load(case_file)
+
+
+class SamplingProfiler:
+    '''Decide which requests are captured.
+
+    Requests are sampled at random, one out of `every_n` on average, which
+    also holds when each process only runs a few of them. Sampled requests are
+    run under cProfile and tracemalloc. Requests slower than
+    `latency_threshold` are only timed, but their input is saved so that they
+    can be profiled offline with `replay.py`. Sampled or timed requests which
+    raise are saved as well before the exception is propagated. A request
+    which is neither sampled nor timed runs without any instrumentation.
+    '''
+
+    def __init__(self, every_n=None, latency_threshold=None, output_dir='profiles', frames=10):
+        '''
+        Args:
+            every_n (int, optional): profile one request out of `every_n` on
+                average, never if None.
+            latency_threshold (float, optional): save the requests slower than
+                this number of seconds, never if None.
+            output_dir (str, optional): where to save the cases of requests
+                without a source document.
+            frames (int, optional): number of frames stored by tracemalloc.
+        '''
+        self.every_n = every_n
+        self.latency_threshold = latency_threshold
+        self.output_dir = output_dir
+        self.frames = frames
+        self.count = 0
+
+    def case_dir(self, doc_path=None):
+        '''Return a new case directory, next to the input document if any.'''
+        name = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}-{self.count}-{uuid.uuid4().hex[:8]}'
+        if doc_path is not None:
+            return os.path.join(doc_path + '.profile', name)
+        return os.path.join(self.output_dir, name)
+
+    def run(self, func, raw_text, params, doc_path=None):
+        '''Run a request, capturing it if sampled or slow.
+
+        Args:
+            func (callable): called with a dict to record stage sizes in, or
+                None if the request is not sampled.
+            raw_text (str): input of the request.
+            params (dict): JSON serializable parameters of the request.
+            doc_path (str, optional): path of the input document.
+
+        Returns:
+            The result of `func`.
+        '''
+        self.count += 1
+
+        if self.every_n is not None and random.random() < 1 / self.every_n:
+            result, error, latency, stages, profile, snapshot = profile_call(func, self.frames)
+            info = {'reason': 'sampled' if error is None else 'error', 'doc_path': doc_path,
+                    'latency_seconds': latency, 'stages': stages, 'error': _describe(error)}
+            save_case(self.case_dir(doc_path), raw_text, params, info, profile, snapshot)
+            if error is not None:
+                raise error
+            return result
+
+        if self.latency_threshold is None:
+            return func(None)
+
+        begin = time.perf_counter()
+        try:
+            result = func(None)
+        except Exception as error:
+            info = {'reason': 'error', 'doc_path': doc_path, 'latency_seconds': time.perf_counter() - begin,
+                    'stages': None, 'error': _describe(error)}
+            save_case(self.case_dir(doc_path), raw_text, params, info)
+            raise
+        latency = time.perf_counter() - begin
+        if latency > self.latency_threshold:
+            info = {'reason': 'slow', 'doc_path': doc_path, 'latency_seconds': latency, 'stages': None,
+                    'error': None}
+            save_case(self.case_dir(doc_path), raw_text, params, info)
+        return result
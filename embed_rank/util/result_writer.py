@@ -0,0 +1,242 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+'''Columnar storage of extraction results.
+
+Results are written as a directory containing a `manifest.json` and one
+sub-directory per row group. Each row group holds one .npy file per column so
+that every column can be memory-mapped with `np.load(..., mmap_mode='r')`:
+
+    doc_ids.data.npy / doc_ids.offsets.npy        utf-8 bytes / row offsets
+    keyphrase_offsets.npy                         keyphrase rows of each document
+    keyphrases.data.npy / keyphrases.offsets.npy  utf-8 bytes / row offsets
+    scores.npy                                    relevance of each keyphrase (float64)
+    alias_offsets.npy                             alias rows of each keyphrase
+    aliases.data.npy / aliases.offsets.npy        utf-8 bytes / row offsets
+    embeddings.npy                                (optional) keyphrase embeddings
+'''
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def _save_strings(directory, name, strings):
+    '''Save a list of strings as a utf-8 buffer and its offsets.'''
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(e) for e in encoded], dtype=np.int64), out=offsets[1:])
+    np.save(os.path.join(directory, name + '.data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, name + '.offsets.npy'), offsets)
+
+
+def _load_strings(directory, name, mmap_mode):
+    '''Load a column saved with @_save_strings as a list of strings.'''
+    data = np.load(os.path.join(directory, name + '.data.npy'), mmap_mode=mmap_mode)
+    offsets = np.load(os.path.join(directory, name + '.offsets.npy'), mmap_mode=mmap_mode)
+    return [bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def _lengths_to_offsets(lengths):
+    '''Convert a list of row lengths to the offsets of each row.'''
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.array(lengths, dtype=np.int64), out=offsets[1:])
+    return offsets
+
+
+class ResultWriter:
+    '''Buffered writer streaming the results of many documents to a columnar
+    directory.
+
+    Nothing is visible at `output_path` until @close is called: row groups are
+    written to a temporary directory which is renamed once the manifest is
+    written. Use as a context manager to discard partial output on error.
+
+    Example :
+    >>with ResultWriter('results') as writer:
+    >>    for doc_id, (keyphrases, relevance, aliases) in results:
+    >>        writer.write(doc_id, keyphrases, relevance, aliases)
+    '''
+
+    def __init__(self, output_path, row_group_size=10000):
+        '''
+        Args:
+            output_path (str): directory to create.
+            row_group_size (int, optional): number of documents buffered before
+                a row group is written.
+        '''
+        if os.path.exists(output_path):
+            raise FileExistsError(f'{output_path} already exists')
+
+        self.output_path = output_path
+        self.row_group_size = row_group_size
+        # A unique staging directory on the same filesystem keeps the final rename
+        # atomic, and leftovers of killed runs do not block new ones
+        self.tmp_path = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)),
+                                         prefix=os.path.basename(os.path.normpath(output_path)) + '.')
+
+        self.row_groups = []
+        self.embedding_dim = None
+        self.closed = False
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self._doc_ids = []
+        self._kp_counts = []
+        self._keyphrases = []
+        self._scores = []
+        self._alias_counts = []
+        self._aliases = []
+        self._embeddings = []
+
+    def write(self, doc_id, keyphrases, relevance, aliases, embeddings=None):
+        '''Buffer the result of one document.
+
+        Args:
+            doc_id (str): document identifier.
+            keyphrases (list): keyphrases (list of string), None if no keyphrase
+                was extracted.
+            relevance (list): relevance score of each keyphrase (list of float).
+            aliases (list): aliases of each keyphrase (list of list of string).
+            embeddings (ndarray, optional): array of shape (len(keyphrases),
+                dimension of embeddings). Either all or none of the documents
+                must be given embeddings.
+        '''
+        if self.closed:
+            raise RuntimeError('Writing to a closed ResultWriter')
+
+        keyphrases = keyphrases or []
+        relevance = relevance or []
+        aliases = aliases or []
+
+        if not len(keyphrases) == len(relevance) == len(aliases):
+            raise ValueError(f'Mismatching number of keyphrases, scores and aliases for document {doc_id}')
+
+        if embeddings is not None:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if embeddings.ndim != 2 or len(embeddings) != len(keyphrases):
+                raise ValueError(f'Expected embeddings of shape ({len(keyphrases)}, dim) for document {doc_id}')
+            if self.embedding_dim is None:
+                if self.row_groups or self._doc_ids:
+                    raise ValueError('Embeddings must be given for all documents or none')
+                self.embedding_dim = embeddings.shape[1]
+            elif embeddings.shape[1] != self.embedding_dim:
+                raise ValueError(f'Expected embeddings of dimension {self.embedding_dim} for document {doc_id}')
+            self._embeddings.append(embeddings)
+        elif self.embedding_dim is not None:
+            raise ValueError('Embeddings must be given for all documents or none')
+
+        self._doc_ids.append(str(doc_id))
+        self._kp_counts.append(len(keyphrases))
+        self._keyphrases.extend(keyphrases)
+        self._scores.extend(relevance)
+        for kp_aliases in aliases:
+            self._alias_counts.append(len(kp_aliases))
+            self._aliases.extend(kp_aliases)
+
+        if len(self._doc_ids) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        '''Write the buffered documents as a new row group.'''
+        if not self._doc_ids:
+            return
+
+        name = 'rg-{:05d}'.format(len(self.row_groups))
+        directory = os.path.join(self.tmp_path, name)
+        os.makedirs(directory)
+
+        _save_strings(directory, 'doc_ids', self._doc_ids)
+        np.save(os.path.join(directory, 'keyphrase_offsets.npy'), _lengths_to_offsets(self._kp_counts))
+        _save_strings(directory, 'keyphrases', self._keyphrases)
+        np.save(os.path.join(directory, 'scores.npy'), np.array(self._scores, dtype=np.float64))
+        np.save(os.path.join(directory, 'alias_offsets.npy'), _lengths_to_offsets(self._alias_counts))
+        _save_strings(directory, 'aliases', self._aliases)
+        if self.embedding_dim is not None:
+            np.save(os.path.join(directory, 'embeddings.npy'),
+                    np.concatenate(self._embeddings).reshape(-1, self.embedding_dim))
+
+        self.row_groups.append({'name': name,
+                                'num_docs': len(self._doc_ids),
+                                'num_keyphrases': len(self._keyphrases)})
+        self._reset_buffer()
+
+    def close(self):
+        '''Flush the remaining documents, write the manifest and atomically
+        move the result to `output_path`.'''
+        if self.closed:
+            return
+
+        self.flush()
+        manifest = {'version': FORMAT_VERSION,
+                    'row_groups': self.row_groups,
+                    'embedding_dim': self.embedding_dim}
+        with open(os.path.join(self.tmp_path, MANIFEST), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        # mkdtemp creates the directory readable by the owner only
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(self.tmp_path, 0o777 & ~umask)
+        os.rename(self.tmp_path, self.output_path)
+        self.closed = True
+
+    def abort(self):
+        '''Discard everything written so far.'''
+        if not self.closed:
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_results(path, mmap_mode='r'):
+    '''Iterate over results written by @ResultWriter.
+
+    Args:
+        path (str): directory written by @ResultWriter.
+        mmap_mode (str, optional): passed to `np.load`.
+
+    Yields:
+        tuple: (doc_id, keyphrases, relevance, aliases, embeddings) with the
+            same types as the result of @MMRPhrase; embeddings is None if they
+            were not written.
+    '''
+    with open(os.path.join(path, MANIFEST)) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    for row_group in manifest['row_groups']:
+        directory = os.path.join(path, row_group['name'])
+
+        doc_ids = _load_strings(directory, 'doc_ids', mmap_mode)
+        kp_offsets = np.load(os.path.join(directory, 'keyphrase_offsets.npy'), mmap_mode=mmap_mode)
+        keyphrases = _load_strings(directory, 'keyphrases', mmap_mode)
+        scores = np.load(os.path.join(directory, 'scores.npy'), mmap_mode=mmap_mode)
+        alias_offsets = np.load(os.path.join(directory, 'alias_offsets.npy'), mmap_mode=mmap_mode)
+        aliases = _load_strings(directory, 'aliases', mmap_mode)
+        embeddings = None
+        if manifest['embedding_dim'] is not None:
+            embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode=mmap_mode)
+
+        for i, doc_id in enumerate(doc_ids):
+            start, end = kp_offsets[i], kp_offsets[i + 1]
+            kp_aliases = [aliases[alias_offsets[k]:alias_offsets[k + 1]] for k in range(start, end)]
+            yield (doc_id,
+                   keyphrases[start:end],
+                   scores[start:end].tolist(),
+                   kp_aliases,
+                   None if embeddings is None else embeddings[start:end])
@@ -3,14 +3,17 @@
 import argparse
 from configparser import ConfigParser
 
-from embed_rank.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+from embed_rank.embeddings.emb_distrib_local import embedding_distributor_from_config
+from embed_rank.model.candidate_index import CandidateFrequencyIndex, DocumentFrequencyFilter
 from embed_rank.model.input_representation import InputTextObj
-from embed_rank.model.method import MMRPhrase, MMRSent
+from embed_rank.model.method import STRATEGIES, MMRPhrase, MMRSent, get_strategy
 from embed_rank.preprocessing.postagging import PosTagging
 from embed_rank.util.fileIO import read_file
+from embed_rank.util.profiling import SamplingProfiler
 
 
-def extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold, x_type='phrase'):
+def extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold, x_type='phrase', strategy='mmr',
+                       dedup_threshold=0.8, candidate_filter=None, profiler=None, doc_path=None):
     '''Extract a set of keyphrases from a string.
 
     Args:
@@ -22,6 +25,15 @@ def extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold,
         beta (float, optional): Beta factor for MMR, indicating the tradeoff
             between informativness and diversity.
         alias_threshold (float, optional): Threshold to group candidates as aliases.
+        x_type (str, optional): Feature type to extract, `phrase` or `sentence`.
+        strategy (str, optional): Selection strategy, see @STRATEGIES.
+        dedup_threshold (float, optional): Similarity threshold of the `dedup` strategy.
+        candidate_filter (DocumentFrequencyFilter, optional): Filter applied to
+            the candidate phrases before they are embedded.
+        profiler (SamplingProfiler, optional): Captures sampled or slow
+            requests, see `replay.py` to run them again.
+        doc_path (str, optional): Path of the document `raw_text` was read
+            from, captured requests are saved next to it.
 
     Returns:
          A tuple with 3 elements :
@@ -29,15 +41,69 @@ def extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold,
             2)list of associated relevance scores (list of float)
             3)list containing for each keyphrase a list of alias (list of list of string)
     '''
+    if profiler is None:
+        return _extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold, x_type, strategy,
+                                   dedup_threshold, candidate_filter)
+
+    params = {'count': count,
+              'beta': beta,
+              'alias_threshold': alias_threshold,
+              'x_type': x_type,
+              'strategy': strategy,
+              'dedup_threshold': dedup_threshold,
+              'candidate_filter': None}
+    if candidate_filter is not None:
+        params['candidate_filter'] = {'df_index': candidate_filter.index.path,
+                                      'max_df': candidate_filter.max_df,
+                                      'min_df': candidate_filter.min_df}
+
+    return profiler.run(lambda stages: _extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold,
+                                                           x_type, strategy, dedup_threshold, candidate_filter,
+                                                           stages),
+                        raw_text, params, doc_path)
+
+
+def _extract_keyphrases(emdist, ptagger, raw_text, count, beta, alias_threshold, x_type, strategy, dedup_threshold,
+                        candidate_filter, stages=None):
+    '''@see extract_keyphrases
+
+    Args:
+        stages (dict, optional): If set, the size of each stage is recorded in it.
+    '''
     tagged = ptagger.pos_tag_raw_text(raw_text)
     text_obj = InputTextObj(tagged)
-    
+    selection = get_strategy(strategy, beta=beta, dedup_threshold=dedup_threshold)
+
+    if stages is not None:
+        stages.update({'sentences': len(text_obj.pos_tagged),
+                       'tokens': sum(len(sent) for sent in text_obj.pos_tagged)})
+
     if x_type == 'phrase':
-        return MMRPhrase(emdist, text_obj, N=count, beta=beta, alias_threshold=alias_threshold)
+        return MMRPhrase(emdist, text_obj, N=count, beta=beta, alias_threshold=alias_threshold, strategy=selection,
+                         candidate_filter=candidate_filter, stages=stages)
     elif x_type == 'sentence':
-        return MMRSent(emdist, text_obj, N=count, beta=beta, alias_threshold=alias_threshold)
+        return MMRSent(emdist, text_obj, N=count, beta=beta, alias_threshold=alias_threshold, strategy=selection,
+                       stages=stages)
     else:
-        raise ValueError(f'Unknown feature type `{x_type}`')    
+        raise ValueError(f'Unknown feature type `{x_type}`')
+
+
+def load_models(config):
+    '''Load the embedding distributor and the POS tagger set in the config.
+
+    Args:
+        config (ConfigParser)
+
+    Returns:
+        A tuple (EmbeddingDistributorLocal, PosTagging)
+    '''
+    embedding_distributor = embedding_distributor_from_config(config)
+
+    spacy_model = config.get('SPACY', 'model')
+    print(f'Loading spacy model {spacy_model}')
+    pos_tagger = PosTagging(model=spacy_model)
+
+    return embedding_distributor, pos_tagger
 
 
 def main():
@@ -58,8 +124,37 @@ def main():
                         help='Number of keyphrases to extract',
                         default=10,
                         type=int)
+    parser.add_argument('-d', '--dedup-threshold',
+                        help='Similarity above which candidates are skipped by the dedup strategy',
+                        default=0.8,
+                        type=float)
+    parser.add_argument('--df-index',
+                        help='Candidate frequency index used to filter candidates, '
+                        'see embed_rank.model.candidate_index')
+    parser.add_argument('--max-df',
+                        help='Drop candidates appearing in more than this proportion of the documents of the index',
+                        default=1.0,
+                        type=float)
+    parser.add_argument('--min-df',
+                        help='Drop candidates appearing in less than this number of documents of the index',
+                        default=0,
+                        type=int)
+    parser.add_argument('--profile-every',
+                        help='Profile one request out of this number on average (sampled at random), see replay.py',
+                        type=int)
+    parser.add_argument('--profile-slower-than',
+                        help='Save the requests slower than this number of seconds, see replay.py',
+                        type=float)
+    parser.add_argument('--profile-dir',
+                        help='Where to save captured requests given as raw text',
+                        default='profiles')
     group.add_argument('-r', '--raw-text',
                        help='Raw text to process')
+    parser.add_argument('-s', '--strategy',
+                        default='mmr',
+                        choices=STRATEGIES,
+                        help='Keyphrase selection strategy: mmr (diversity-aware), relevance (top-N by '
+                        'similarity to the document) or dedup (greedy, skipping near-duplicates)')
     group.add_argument('-t', '--text-file',
                        help='File containing raw text to process')
     parser.add_argument('-x', '--x-type',
@@ -73,16 +168,21 @@ def main():
     else:
         raw_text = args.raw_text
 
-    config = ConfigParser()
-    config.read('config.ini')
+    candidate_filter = None
+    if args.df_index:
+        candidate_filter = DocumentFrequencyFilter(CandidateFrequencyIndex.load(args.df_index),
+                                                   max_df=args.max_df,
+                                                   min_df=args.min_df)
 
-    sent2vec_model = config.get('SENT2VEC', 'model_path')
-    print(f'Loading sent2vec model from {sent2vec_model}')
-    embedding_distributor = EmbeddingDistributorLocal(sent2vec_model)
+    profiler = None
+    if args.profile_every or args.profile_slower_than:
+        profiler = SamplingProfiler(every_n=args.profile_every,
+                                    latency_threshold=args.profile_slower_than,
+                                    output_dir=args.profile_dir)
 
-    spacy_model = config.get('SPACY', 'model')
-    print(f'Loading spacy model {spacy_model}')
-    pos_tagger = PosTagging(model=spacy_model)
+    config = ConfigParser()
+    config.read('config.ini')
+    embedding_distributor, pos_tagger = load_models(config)
 
     print(f'Extracting {args.count} keyphrases')
     keyphrases = extract_keyphrases(embedding_distributor,
@@ -91,7 +191,12 @@ def main():
                                     args.count,
                                     args.beta,
                                     args.alias_threshold,
-                                    args.x_type)
+                                    args.x_type,
+                                    args.strategy,
+                                    args.dedup_threshold,
+                                    candidate_filter,
+                                    profiler,
+                                    args.text_file)
     print(keyphrases)
 
 
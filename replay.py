@@ -0,0 +1,85 @@
+# coding: utf-8
+
+import argparse
+import os
+import pstats
+import time
+from configparser import ConfigParser
+
+from embed_rank.model.candidate_index import CandidateFrequencyIndex, DocumentFrequencyFilter
+from embed_rank.util.profiling import _describe, load_case, profile_call, save_case
+from launch import _extract_keyphrases, load_models
+
+
+def replay(emdist, ptagger, case_path, output_path=None):
+    '''Run a request captured by @SamplingProfiler again under cProfile and
+    tracemalloc.
+
+    Args:
+        emdist (EmbeddingDistributor)
+        ptagger (PosTagger)
+        case_path (str): directory of the captured case.
+        output_path (str, optional): where to save the new case, not saved if None.
+
+    The new case is saved even if the extraction raises, then the exception
+    is propagated.
+
+    Returns:
+        A tuple with the result of the extraction, its latency in seconds, the
+        stage sizes and the `cProfile.Profile`.
+    '''
+    raw_text, case = load_case(case_path)
+    params = case['params']
+
+    candidate_filter = None
+    if params['candidate_filter'] is not None:
+        candidate_filter = DocumentFrequencyFilter(CandidateFrequencyIndex.load(params['candidate_filter']['df_index']),
+                                                   max_df=params['candidate_filter']['max_df'],
+                                                   min_df=params['candidate_filter']['min_df'])
+
+    result, error, latency, stages, profile, snapshot = profile_call(
+        lambda stages: _extract_keyphrases(emdist, ptagger, raw_text, params['count'], params['beta'],
+                                           params['alias_threshold'], params['x_type'], params['strategy'],
+                                           params['dedup_threshold'], candidate_filter, stages))
+
+    if output_path is not None:
+        info = {'reason': 'replay', 'doc_path': case.get('doc_path'), 'replay_of': case_path,
+                'latency_seconds': latency, 'stages': stages, 'error': _describe(error)}
+        save_case(output_path, raw_text, params, info, profile, snapshot)
+    if error is not None:
+        raise error
+
+    return result, latency, stages, profile
+
+
+def main():
+    '''Parse args and replay a captured request.
+    '''
+    parser = argparse.ArgumentParser(description='Replay a request captured with launch.py --profile-every or '
+                                     '--profile-slower-than')
+    parser.add_argument('case', help='Directory of the captured request')
+    parser.add_argument('-o', '--output',
+                        help='Where to save the profile of the replay, defaults to a new directory inside the case')
+    parser.add_argument('-n', '--top',
+                        help='Number of functions to print, sorted by cumulative time',
+                        default=25,
+                        type=int)
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.join(args.case, 'replay-' + time.strftime('%Y%m%d-%H%M%S'))
+
+    config = ConfigParser()
+    config.read('config.ini')
+    embedding_distributor, pos_tagger = load_models(config)
+
+    result, latency, stages, profile = replay(embedding_distributor, pos_tagger, args.case, output_path)
+
+    print(result)
+    print(f'Latency: {latency:.3f}s')
+    print(f'Stages: {stages}')
+    pstats.Stats(profile).sort_stats('cumulative').print_stats(args.top)
+    print(f'Profile written to {output_path}')
+
+
+if __name__ == '__main__':
+    main()